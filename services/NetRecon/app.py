@@ -1,35 +1,50 @@
 import os
-from flask import Flask, jsonify, request, g, Response
-from geoip_resolver import lookup_ip
+from flask import Flask, request, g, Response
+import orjson
+
+from logging_config import setup_logging
+
+# Configure logging before importing modules that log while loading data
+setup_logging()
+
+from geoip_resolver import lookup_ip, lookup_ips, lookup_cache_info
 
 from datetime import datetime, timedelta
 from config import settings
 from formatters import to_ipwhois_format
 
-from logging_config import setup_logging
-from metrics import metrics
+from metrics import get_metrics
 import logging
 import time
-from prometheus_exporter import format_prometheus_metrics
+from prometheus_exporter import iter_prometheus_metrics
 
 from rate_limiter import check_rate_limit
+from util import orjson_default
 
-# Configure logging before creating the app
-setup_logging()
 logger = logging.getLogger(__name__)
 
+
 app = Flask(__name__)
 
+# Status code counters use int keys; datetimes are emitted as UTC ISO-8601
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+
+
+def ojsonify(obj, status: int = 200) -> Response:
+	"""orjson-backed replacement for flask.jsonify."""
+	return app.response_class(
+		orjson.dumps(obj, default=orjson_default, option=ORJSON_OPTIONS),
+		status=status,
+		mimetype="application/json",
+	)
 
-@app.before_request
-def before_request():
-	"""Store request start time and enforce rate limiting."""
-	g.request_start_time = time.perf_counter()
 
+def _enforce_rate_limit(cost: int = 1):
+	"""Charge cost against the client's rate limit; return a 429 response if exceeded."""
 	# Extract client IP (respecting X-Forwarded-For if present)
 	client_ip = request.headers.get("X-Forwarded-For", request.remote_addr) or "unknown"
 
-	rl_result = check_rate_limit(client_ip)
+	rl_result = check_rate_limit(client_ip, cost)
 
 	if not rl_result.allowed:
 		# Build a 429 Too Many Requests response
@@ -38,11 +53,22 @@ def before_request():
 			"message": "Too many requests. Please slow down.",
 			"retry_after_seconds": rl_result.retry_after,
 		}
-		resp = jsonify(payload)
-		resp.status_code = 429
+		resp = ojsonify(payload, status=429)
 		if rl_result.retry_after is not None:
 			resp.headers["Retry-After"] = str(rl_result.retry_after)
 		return resp
+	return None
+
+
+# Metrics label for requests that matched no route (404s from scanners etc.)
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+@app.before_request
+def before_request():
+	"""Store request start time and enforce rate limiting."""
+	g.request_start_time = time.perf_counter()
+	return _enforce_rate_limit()
 
 
 @app.after_request
@@ -61,8 +87,12 @@ def after_request(response):
 		method = request.method
 		client_ip = request.headers.get("X-Forwarded-For", request.remote_addr)
 
-		# Record metrics
-		metrics.record_request(path=path, status_code=status_code, duration_ms=duration_ms)
+		# Record metrics per route template (/ip/<ip>), not per concrete URL,
+		# so the path label stays bounded however many IPs are looked up
+		rule = request.url_rule
+		route = rule.rule if rule is not None else UNMATCHED_ROUTE
+
+		get_metrics().record_request(path=route, status_code=status_code, duration_ms=duration_ms)
 
 		# Structured-ish logging (simple key=value style)
 		logger.info(
@@ -78,6 +108,15 @@ def after_request(response):
 
 	return response
 
+def _lookup_error_payload(ip: str, err: str) -> tuple[dict, int]:
+	"""Map a lookup error code to its JSON payload and HTTP status."""
+	if err == "invalid_ip":
+		return {"error": "invalid_ip", "ip": ip}, 400
+	if err == "not_found":
+		return {"error": "ip_not_found", "ip": ip}, 404
+	return {"error": "lookup_failed", "details": err}, 502
+
+
 @app.route("/ip/<ip>")
 def ip_lookup(ip):
 	"""Perform an IP lookup using local GeoLite2 databases.
@@ -86,51 +125,88 @@ def ip_lookup(ip):
 		raw=1        -> returns internal normalized payload
 		compat=ipwhois -> returns ipwho.is compatible payload
 	"""
-	print(f"[+] Lookup request for IP: {ip}")
+	logger.debug("Lookup request for IP: %s", ip)
 	raw = request.args.get("raw", "0").lower() in ("1", "true", "yes")
 	compat = request.args.get("compat", "").lower()
 
 	data, err = lookup_ip(ip)
-	
 
-	if err == "invalid_ip":
-		return jsonify({"error": "invalid_ip", "ip": ip}), 400
-	if err == "not_found":
-		return jsonify({"error": "ip_not_found", "ip": ip}), 404
-	if err and err.startswith("lookup_error"):
-		return jsonify({"error": "lookup_failed", "details": err}), 502
+	if err:
+		payload, status = _lookup_error_payload(ip, err)
+		return ojsonify(payload, status)
 
 	if compat == "ipwhois":
-		return jsonify(to_ipwhois_format(data))
+		return ojsonify(to_ipwhois_format(data))
 
 	# Raw is currently equal to the normalized output
-	return jsonify(data)
+	return ojsonify(data)
+
+
+@app.route("/ip", methods=["POST"])
+def ip_batch_lookup():
+	"""Look up many IPs in one request.
+
+	Body: {"ips": ["8.8.8.8", "1.1.1.1", ...]}
+	Query params: compat=ipwhois as for /ip/<ip>.
+	Returns an object keyed by IP holding each result or error payload.
+	Each distinct IP costs one rate-limit token, like a single lookup.
+	"""
+	compat = request.args.get("compat", "").lower()
+
+	try:
+		ips = orjson.loads(request.get_data())["ips"]
+	except (orjson.JSONDecodeError, KeyError, TypeError):
+		ips = None
+	if not isinstance(ips, list) or not all(isinstance(ip, str) for ip in ips):
+		return ojsonify({"error": "invalid_body", "message": 'Expected {"ips": ["<ip>", ...]}'}, 400)
+
+	if len(ips) > settings.batch_max_ips:
+		return ojsonify({"error": "too_many_ips", "max_ips": settings.batch_max_ips}, 413)
+
+	# before_request already charged one token for the request itself
+	extra_cost = len(set(ips)) - 1
+	if extra_cost > 0:
+		limited = _enforce_rate_limit(extra_cost)
+		if limited is not None:
+			return limited
+
+	results = {}
+	for ip, (data, err) in lookup_ips(ips).items():
+		if err:
+			results[ip], _ = _lookup_error_payload(ip, err)
+		elif compat == "ipwhois":
+			results[ip] = to_ipwhois_format(data)
+		else:
+			results[ip] = data
+
+	return ojsonify(results)
 
 @app.route("/health")
 def health():
 	"""Simple health check endpoint."""
-	return jsonify({"status": "ok"}), 200
+	return ojsonify({"status": "ok"}, 200)
 
 
 @app.route("/metrics")
 def metrics_endpoint():
 	"""Expose basic in-memory metrics for observability."""
-	snap = metrics.snapshot()
-	return jsonify(snap), 200
+	snap = {**get_metrics().snapshot(), "lookup_cache": lookup_cache_info()}
+	return ojsonify(snap, 200)
 
 @app.route("/metrics/prom")
 def metrics_prom_endpoint():
 	"""Expose metrics in Prometheus text exposition format."""
-	snap = metrics.snapshot()
-	body = format_prometheus_metrics(snap)
-	# Prometheus text format content type
+	snap = get_metrics().snapshot()
+	# Streamed as ready-encoded byte chunks; Prometheus text format content type
 	return Response(
-		body,
+		iter_prometheus_metrics(snap),
 		status=200,
-		mimetype="text/plain; version=0.0.4; charset=utf-8",
+		content_type="text/plain; version=0.0.4; charset=utf-8",
 	)
 
 if __name__ == "__main__":
+	# Development server only; production runs under gunicorn:
+	#   gunicorn -c gunicorn.conf.py app:app
 	port = settings.port
 	# Debug should only be enabled in development
 	if settings.flask_debug:
@@ -35,6 +35,19 @@ class Settings:
 	port: int = _env_int("NETRECON_PORT", 5000)
 	flask_debug: bool = _env_bool("NETRECON_DEBUG", False)
 
+	# Gunicorn (production server, see gunicorn.conf.py)
+	# One worker by default: metrics are kept in-process and not merged across workers
+	gunicorn_workers: int = _env_int("NETRECON_GUNICORN_WORKERS", 1)
+	gunicorn_threads: int = _env_int("NETRECON_GUNICORN_THREADS", 8)
+
+	# Maximum number of IPs accepted by POST /ip
+	batch_max_ips: int = _env_int("NETRECON_BATCH_MAX_IPS", 50)
+	# Batch lookups run concurrently on a shared pool, under one deadline per request
+	batch_max_workers: int = _env_int("NETRECON_BATCH_MAX_WORKERS", 16)
+	batch_timeout_seconds: float = float(
+		os.getenv("NETRECON_BATCH_TIMEOUT_SECONDS", "10.0")
+	)
+
 	# Logging
 	log_level: str = os.getenv("NETRECON_LOG_LEVEL", "INFO")
 
@@ -58,6 +71,18 @@ class Settings:
 		)
 	)
 
+	# Number of assembled IP lookup results kept in memory
+	geoip_cache_size: int = _env_int("NETRECON_GEOIP_CACHE_SIZE", 65536)
+	geoip_cache_ttl_seconds: int = _env_int("NETRECON_GEOIP_CACHE_TTL_SECONDS", 3600)
+
+	# Optional Redis tier for lookup results, shared across workers/hosts
+	geoip_redis_cache_enabled: bool = _env_bool(
+		"NETRECON_GEOIP_REDIS_CACHE_ENABLED", False
+	)
+	geoip_redis_cache_ttl_seconds: int = _env_int(
+		"NETRECON_GEOIP_REDIS_CACHE_TTL_SECONDS", 86400
+	)
+
 	# Domain resolver config
 	domain_resolution_enabled: bool = _env_bool(
 		"NETRECON_DOMAIN_RESOLUTION_ENABLED", True
@@ -75,6 +100,7 @@ class Settings:
 	http_timeout_seconds: float = float(
 		os.getenv("NETRECON_HTTP_TIMEOUT_SECONDS", "5.0")
 	)
+	dns_max_workers: int = _env_int("NETRECON_DNS_MAX_WORKERS", 32)
 
 	reverse_dns_cache_size: int = _env_int(
 		"NETRECON_REVERSE_DNS_CACHE_SIZE", 4096
@@ -83,6 +109,17 @@ class Settings:
 		"NETRECON_PEERINGDB_CACHE_SIZE", 2048
 	)
 
+	# Cache lifetimes (seconds); failed resolutions expire sooner
+	reverse_dns_cache_ttl_seconds: int = _env_int(
+		"NETRECON_REVERSE_DNS_CACHE_TTL_SECONDS", 3600
+	)
+	peeringdb_cache_ttl_seconds: int = _env_int(
+		"NETRECON_PEERINGDB_CACHE_TTL_SECONDS", 86400
+	)
+	domain_negative_cache_ttl_seconds: int = _env_int(
+		"NETRECON_DOMAIN_NEGATIVE_CACHE_TTL_SECONDS", 300
+	)
+
 	# Redis configuration
 	redis_url: str = os.getenv("NETRECON_REDIS_URL", "redis://localhost:6379/0")
 
@@ -1,12 +1,23 @@
+import html
 import ipaddress
-import socket
-from functools import lru_cache
+import logging
+import re
+import threading
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import wraps
 from urllib.parse import urlparse
 
 from config import settings
 
+from cachetools import TTLCache
+import dns.exception
+import dns.resolver
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
 
 # Domain resolution configuration
 DOMAIN_RESOLUTION_ENABLED = settings.domain_resolution_enabled
@@ -17,12 +28,94 @@ PEERINGDB_SCRAPE_ENABLED = settings.peeringdb_scrape_enabled
 DEFAULT_DNS_TIMEOUT = settings.dns_timeout_seconds  # seconds
 DEFAULT_HTTP_TIMEOUT = settings.http_timeout_seconds  # seconds
 
-# Cache sizes from settings
+# Cache sizes and lifetimes from settings
 REVERSE_DNS_CACHE_SIZE = settings.reverse_dns_cache_size
 PEERINGDB_CACHE_SIZE = settings.peeringdb_cache_size
+REVERSE_DNS_CACHE_TTL = settings.reverse_dns_cache_ttl_seconds
+PEERINGDB_CACHE_TTL = settings.peeringdb_cache_ttl_seconds
+NEGATIVE_CACHE_TTL = settings.domain_negative_cache_ttl_seconds
+
+# Common host prefix stripped from normalized domains
+_WWW_PREFIX = "www."
+
+# Cache miss marker (None is a valid cached result)
+_MISS = object()
+
+# PTR queries go through dnspython with a hard lifetime instead of the
+# blocking libc resolver, and run on a bounded pool so they can overlap
+# with the mmdb reads of the same request
+try:
+	_dns_resolver = dns.resolver.Resolver(configure=True)
+	_dns_resolver.lifetime = DEFAULT_DNS_TIMEOUT
+except Exception as e:
+	logger.error("Failed to configure DNS resolver, reverse DNS disabled: %s", e)
+	_dns_resolver = None
+
+_dns_executor = ThreadPoolExecutor(
+	max_workers=settings.dns_max_workers,
+	thread_name_prefix="netrecon-dns",
+)
+
+# PTR queries currently running, keyed by IP
+_inflight_rdns: dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
+# Website block of a PeeringDB network page (based on current markup, may break
+# if the site changes): group 1 is the anchor href, group 2 the plain-text value
+_WEBSITE_RE = re.compile(
+	rb'data-edit-name="website"[^>]*>\s*(?:<a[^>]*?href="([^"]+)"|([^<]+))',
+	re.S,
+)
+
+# Shared HTTP session so PeeringDB misses reuse pooled TCP/TLS connections
+_pdb_session = requests.Session()
+_pdb_session.mount(
+	"https://",
+	HTTPAdapter(
+		pool_connections=10,
+		pool_maxsize=50,
+		# Retry gateway errors and one failed connect, but never a read timeout:
+		# those already cost the full HTTP timeout on the request path
+		max_retries=Retry(total=2, connect=1, read=0, backoff_factor=0.2, status_forcelist=(502, 503, 504)),
+	),
+)
+_pdb_session.headers.update({
+	"User-Agent": "NetRecon",
+	"Accept-Encoding": "gzip",
+})
+
+
+def _ttl_cached(maxsize: int, ttl: float, negative_ttl: float):
+	"""Memoize a single-argument resolver with separate lifetimes for hits and None results.
+
+	Failed lookups are kept for a shorter time so they are retried soon,
+	but not on every request.
+	"""
+	def decorator(func):
+		positive = TTLCache(maxsize=maxsize, ttl=ttl)
+		negative = TTLCache(maxsize=maxsize, ttl=negative_ttl)
+		lock = threading.Lock()
+
+		@wraps(func)
+		def wrapper(key):
+			with lock:
+				value = positive.get(key, _MISS)
+				if value is _MISS:
+					value = negative.get(key, _MISS)
+			if value is not _MISS:
+				return value
+
+			value = func(key)
+			with lock:
+				if value is None:
+					negative[key] = value
+				else:
+					positive[key] = value
+			return value
 
-# Set a global default timeout for socket operations
-socket.setdefaulttimeout(DEFAULT_DNS_TIMEOUT)
+		return wrapper
+
+	return decorator
 
 
 def _normalize_domain(value: str | None) -> str | None:
@@ -34,6 +127,13 @@ def _normalize_domain(value: str | None) -> str | None:
 	if not value:
 		return None
 
+	# Fast path: a bare hostname needs no URL parsing
+	if ":" not in value and "/" not in value and "?" not in value:
+		host = value.lower()
+		if host.startswith(_WWW_PREFIX):
+			host = host[len(_WWW_PREFIX):]
+		return host or None
+
 	# If there is no scheme, prepend one so urlparse can handle it
 	if "://" not in value:
 		value = "http://" + value
@@ -44,22 +144,31 @@ def _normalize_domain(value: str | None) -> str | None:
 		return None
 
 	# Strip common "www." prefix
-	if host.startswith("www."):
-		host = host[4:]
+	if host.startswith(_WWW_PREFIX):
+		host = host[len(_WWW_PREFIX):]
 
 	return host.lower()
 
 
-@lru_cache(maxsize=REVERSE_DNS_CACHE_SIZE)
+@_ttl_cached(REVERSE_DNS_CACHE_SIZE, REVERSE_DNS_CACHE_TTL, NEGATIVE_CACHE_TTL)
 def _reverse_dns_cached(ip: str) -> str | None:
 	"""Cached reverse DNS resolver for IP -> domain."""
+	if _dns_resolver is None:
+		return None
+
 	try:
-		hostname, aliases, _ = socket.gethostbyaddr(ip)
-	except (socket.herror, socket.gaierror):
+		answer = _dns_resolver.resolve_address(ip)
+		hostname = answer[0].target.to_text(omit_final_dot=True)
+	except (
+		dns.resolver.NXDOMAIN,
+		dns.resolver.NoAnswer,
+		dns.resolver.NoNameservers,
+		dns.exception.Timeout,
+	):
 		# No PTR record or DNS failure
 		return None
 	except Exception as e:
-		print(f"[!] Reverse DNS error for IP {ip}: {e}")
+		logger.warning("Reverse DNS error for IP %s: %s", ip, e)
 		return None
 
 	if not hostname:
@@ -72,70 +181,102 @@ def _reverse_dns_cached(ip: str) -> str | None:
 	return hostname.lower()
 
 
-@lru_cache(maxsize=PEERINGDB_CACHE_SIZE)
+@_ttl_cached(PEERINGDB_CACHE_SIZE, PEERINGDB_CACHE_TTL, NEGATIVE_CACHE_TTL)
 def _fetch_peeringdb_website_html_cached(asn: int) -> str | None:
 	"""Cached PeeringDB website extraction for an ASN using HTML scraping."""
 	url = f"https://www.peeringdb.com/asn/{asn}"
 	try:
-		resp = requests.get(url, timeout=DEFAULT_HTTP_TIMEOUT)
+		resp = _pdb_session.get(url, timeout=DEFAULT_HTTP_TIMEOUT)
 	except Exception as e:
-		print(f"[!] PeeringDB request failed for ASN {asn}: {e}")
+		logger.warning("PeeringDB request failed for ASN %s: %s", asn, e)
 		return None
 
 	if resp.status_code != 200:
-		print(f"[-] PeeringDB returned status {resp.status_code} for ASN {asn}")
+		logger.info("PeeringDB returned status %s for ASN %s", resp.status_code, asn)
 		return None
 
-	try:
-		soup = BeautifulSoup(resp.text, "html.parser")
-	except Exception as e:
-		print(f"[!] Failed to parse PeeringDB HTML for ASN {asn}: {e}")
+	# Scan the raw bytes for the one field we need instead of parsing the page
+	match = _WEBSITE_RE.search(resp.content)
+	if not match:
 		return None
 
-	# This selector is based on current PeeringDB markup and may break if the site changes.
-	div = soup.find(
-		"div",
-		{
-			"class": "view_value col-8 col-sm-7 col-md-8",
-			"data-edit-name": "website",
-		},
-	)
-	if not div:
+	raw = match.group(1) or match.group(2)
+	href = html.unescape(raw.decode("utf-8", "replace")).strip()
+
+	return href or None
+
+
+def _is_public_ip(ip: str) -> bool:
+	"""Return True for valid IPs outside private/loopback/reserved/link-local ranges."""
+	try:
+		ip_obj = ipaddress.ip_address(ip)
+	except ValueError:
+		return False
+	return not (ip_obj.is_private or ip_obj.is_loopback or ip_obj.is_reserved or ip_obj.is_link_local)
+
+
+def _forget_inflight(ip: str, future: Future) -> None:
+	"""Drop a finished PTR query from the in-flight table."""
+	with _inflight_lock:
+		if _inflight_rdns.get(ip) is future:
+			del _inflight_rdns[ip]
+
+
+def start_reverse_dns(ip: str) -> Future | None:
+	"""Submit a PTR query to the resolver pool; the future is consumed by resolve_domain_for_ip.
+
+	Concurrent callers for the same IP share one in-flight query, so batch
+	prefetches and the lookups that follow them never query twice.
+	"""
+	if not (DOMAIN_RESOLUTION_ENABLED and REVERSE_DNS_ENABLED) or not _is_public_ip(ip):
 		return None
 
-	a = div.find("a")
-	href = None
-	if a:
-		href = a.get("href") or a.get_text(strip=True)
-	else:
-		href = div.get_text(strip=True)
+	with _inflight_lock:
+		future = _inflight_rdns.get(ip)
+		if future is not None:
+			return future
+		future = _dns_executor.submit(_reverse_dns_cached, ip)
+		_inflight_rdns[ip] = future
 
-	return href or None
+	# Registered outside the lock: it runs immediately if the query already finished
+	future.add_done_callback(lambda f: _forget_inflight(ip, f))
+	return future
 
 
-def resolve_domain_for_ip(ip: str, asn_number: int | None = None) -> str | None:
+def resolve_domain_for_ip(
+	ip: str,
+	asn_number: int | None = None,
+	rdns_future: Future | None = None,
+) -> str | None:
 	"""Resolve a best-effort domain for an IP using multiple strategies.
 
 	Priority:
 		1. Skip private/loopback/reserved IPs entirely
-		2. Reverse DNS (PTR) with caching
+		2. Reverse DNS (PTR) with caching, optionally already in flight
+		   via start_reverse_dns()
 		3. PeeringDB website for ASN with caching
 	"""
 	if not DOMAIN_RESOLUTION_ENABLED:
 		return None
 
-	# Skip internal/non-routable IPs to avoid useless lookups
-	try:
-		ip_obj = ipaddress.ip_address(ip)
-		if ip_obj.is_private or ip_obj.is_loopback or ip_obj.is_reserved or ip_obj.is_link_local:
-			return None
-	except ValueError:
-		# If IP is somehow invalid, bail out
+	# Skip internal/non-routable (or invalid) IPs to avoid useless lookups
+	if not _is_public_ip(ip):
 		return None
 
 	# 1) Reverse DNS
 	if REVERSE_DNS_ENABLED:
-		rdns_domain = _reverse_dns_cached(ip)
+		if rdns_future is not None:
+			try:
+				rdns_domain = rdns_future.result(timeout=DEFAULT_DNS_TIMEOUT)
+			except FutureTimeoutError:
+				# Drop the query if it is still queued so a backlog cannot keep growing
+				rdns_future.cancel()
+				rdns_domain = None
+			except CancelledError:
+				# Another waiter on the shared query timed out and cancelled it
+				rdns_domain = None
+		else:
+			rdns_domain = _reverse_dns_cached(ip)
 		if rdns_domain:
 			return rdns_domain
 
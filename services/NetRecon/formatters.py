@@ -13,7 +13,7 @@ def to_ipwhois_format(data: dict) -> dict:
 
 	# Normalize borders: ["FR", "DE", "LU", "NL"] -> "FR,DE,LU,NL"
 	borders = data.get("borders")
-	if isinstance(borders, list):
+	if isinstance(borders, (list, tuple)):
 		borders_str = ",".join(borders)
 	elif isinstance(borders, str):
 		borders_str = borders
@@ -1,60 +1,37 @@
-import json
 from pathlib import Path
 
+import ijson
+import orjson
 import requests
 
+from util import country_code_to_emoji, country_code_to_unicode_codes
+
 BASE_DIR = Path(__file__).resolve().parent
 OUTPUT_PATH = BASE_DIR / "data" / "country_meta.json"
 RESTCOUNTRIES_URL = "https://restcountries.com/v3.1/all"
 
 
-def _country_code_to_emoji(cc: str | None) -> str | None:
-	"""Convert ISO2 country code to flag emoji."""
-	if not cc or len(cc) != 2:
-		return None
-	try:
-		base = 0x1F1E6
-		first = base + (ord(cc[0].upper()) - ord("A"))
-		second = base + (ord(cc[1].upper()) - ord("A"))
-		return chr(first) + chr(second)
-	except Exception:
-		return None
-
-
-def _emoji_to_unicode_codes(emoji: str | None) -> str | None:
-	"""Convert emoji string to unicode code representation (e.g. U+1F1E7 U+1F1EA)."""
-	if not emoji:
-		return None
-	return " ".join(f"U+{ord(ch):04X}" for ch in emoji)
-
-
 def fetch_countries():
-	"""Fetch raw country data from RestCountries API."""
-	resp = requests.get(
+	"""Stream raw country entries from RestCountries API one at a time."""
+	with requests.get(
 		RESTCOUNTRIES_URL,
 		params={
 			"fields": "cca2,cca3,name,capital,idd,borders",
 		},
 		timeout=15,
-	)
-	resp.raise_for_status()
-	return resp.json()
-
+		stream=True,
+	) as resp:
+		resp.raise_for_status()
+		# Let urllib3 undo any gzip/deflate transfer encoding for the parser
+		resp.raw.decode_content = True
+		yield from ijson.items(resp.raw, "item")
 
-def build_alpha3_to_alpha2_map(raw_countries) -> dict:
-	"""Build a mapping from ISO3 (cca3) to ISO2 (cca2) codes."""
-	mapping: dict = {}
-	for c in raw_countries:
-		cca2 = c.get("cca2")
-		cca3 = c.get("cca3")
-		if cca2 and cca3:
-			mapping[cca3.upper()] = cca2.upper()
-	return mapping
 
-
-def build_country_meta(raw_countries, alpha3_to_alpha2: dict) -> dict:
-	"""Build country metadata dict keyed by ISO2 (cca2)."""
+def build_country_meta(raw_countries) -> dict:
+	"""Build country metadata dict keyed by ISO2 (cca2) in a single pass."""
 	meta: dict = {}
+	# ISO3 (cca3) -> ISO2 (cca2), used to convert borders once all entries are seen
+	alpha3_to_alpha2: dict = {}
 
 	for c in raw_countries:
 		code = c.get("cca2")
@@ -63,6 +40,10 @@ def build_country_meta(raw_countries, alpha3_to_alpha2: dict) -> dict:
 
 		code = code.upper()
 
+		cca3 = c.get("cca3")
+		if cca3:
+			alpha3_to_alpha2[cca3.upper()] = code
+
 		# Name
 		name_data = c.get("name") or {}
 		name = name_data.get("common") or name_data.get("official") or code
@@ -82,16 +63,13 @@ def build_country_meta(raw_countries, alpha3_to_alpha2: dict) -> dict:
 		else:
 			calling_code = None
 
-		# Borders: convert ISO3 to ISO2 using the mapping
-		borders_iso3 = c.get("borders") or []
-		borders_iso2 = [
-			alpha3_to_alpha2.get(b.upper(), b.upper()) for b in borders_iso3
-		]
+		# Borders: kept as ISO3 until the mapping is complete
+		borders_iso3 = [b.upper() for b in c.get("borders") or []]
 
 		# Flag URLs + emoji
 		cc_lower = code.lower()
-		emoji = _country_code_to_emoji(code)
-		emoji_unicode = _emoji_to_unicode_codes(emoji)
+		emoji = country_code_to_emoji(code)
+		emoji_unicode = country_code_to_unicode_codes(code)
 
 		flag = {
 			"emoji": emoji,
@@ -103,29 +81,25 @@ def build_country_meta(raw_countries, alpha3_to_alpha2: dict) -> dict:
 			"name": name,
 			"calling_code": calling_code,
 			"capital": capital,
-			"borders": borders_iso2,
+			"borders": borders_iso3,
 			"flag": flag,
 		}
 
+	# Borders may reference countries that appear later in the stream
+	for entry in meta.values():
+		entry["borders"] = [alpha3_to_alpha2.get(b, b) for b in entry["borders"]]
+
 	return meta
 
 
 def main():
 	"""Fetch, build and write country metadata file."""
-	print("[*] Fetching country data from RestCountries...")
-	countries = fetch_countries()
-	print(f"[+] Received {len(countries)} raw country entries.")
-
-	alpha3_to_alpha2 = build_alpha3_to_alpha2_map(countries)
-	print(f"[+] Built alpha3->alpha2 mapping for {len(alpha3_to_alpha2)} codes.")
-
-	meta = build_country_meta(countries, alpha3_to_alpha2)
+	print("[*] Streaming country data from RestCountries...")
+	meta = build_country_meta(fetch_countries())
 	print(f"[+] Built metadata for {len(meta)} countries.")
 
 	OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
-
-	with OUTPUT_PATH.open("w", encoding="utf-8") as f:
-		json.dump(meta, f, ensure_ascii=False, indent=2)
+	OUTPUT_PATH.write_bytes(orjson.dumps(meta, option=orjson.OPT_INDENT_2))
 
 	print(f"[+] Written country_meta.json to: {OUTPUT_PATH}")
 
@@ -1,16 +1,28 @@
 import json
 import ipaddress
+import logging
 import socket
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
+from functools import lru_cache
 from pathlib import Path
+from types import MappingProxyType
 from zoneinfo import ZoneInfo
 
-from domain_resolver import resolve_domain_for_ip
+from domain_resolver import resolve_domain_for_ip, start_reverse_dns
+from redis_client import get_redis_client
+from util import country_code_to_emoji, country_code_to_unicode_codes, orjson_default
 
 
 from config import settings
-import geoip2.database
-import geoip2.errors
+import maxminddb
+import orjson
+from cachetools import TLRUCache, cached
+from cachetools.func import ttl_cache
+
+logger = logging.getLogger(__name__)
 
 # Base directory
 BASE_DIR = Path(__file__).resolve().parent
@@ -20,40 +32,98 @@ GEOIP_CITY_DB = settings.geoip_city_db
 GEOIP_ASN_DB = settings.geoip_asn_db
 COUNTRY_META_FILE = settings.country_meta_path
 
-# Load databases lazily once
-city_reader = geoip2.database.Reader(str(GEOIP_CITY_DB))
-asn_reader = geoip2.database.Reader(str(GEOIP_ASN_DB))
+# Cache size and lifetime for assembled lookup results; the lifetime keeps
+# the embedded domain data in step with the resolver caches
+GEOIP_CACHE_SIZE = settings.geoip_cache_size
+GEOIP_CACHE_TTL = settings.geoip_cache_ttl_seconds
+
+# Results whose domain could not be resolved (PTR timeout, PeeringDB miss)
+# expire like the resolvers' own negative entries, so the retry is not
+# masked by the assembled result
+GEOIP_DOMAIN_RETRY_TTL = min(GEOIP_CACHE_TTL, settings.domain_negative_cache_ttl_seconds)
+DOMAIN_RESOLUTION_ENABLED = settings.domain_resolution_enabled
+
+# Optional Redis tier shared by all workers/hosts, behind the in-process cache
+GEOIP_REDIS_CACHE_ENABLED = settings.geoip_redis_cache_enabled
+# Stored results embed the PTR-derived domain, so they never outlive the PTR cache
+GEOIP_REDIS_CACHE_TTL = (
+	min(settings.geoip_redis_cache_ttl_seconds, settings.reverse_dns_cache_ttl_seconds)
+	if settings.domain_resolution_enabled
+	else settings.geoip_redis_cache_ttl_seconds
+)
+GEOIP_REDIS_KEY_PREFIX = "gip:v1:"
+
+# Batch lookups: shared pool size and the deadline for a whole batch
+BATCH_MAX_WORKERS = settings.batch_max_workers
+BATCH_TIMEOUT = settings.batch_timeout_seconds
+
+# Timezone blocks only need second-level freshness; offsets change hourly at most
+TIMEZONE_CACHE_SIZE = 512
+TIMEZONE_CACHE_TTL = 30  # seconds
+
+# EU member states by ISO2 code, plus the outermost regions and Åland, which
+# have their own codes and which MaxMind's is_in_european_union flags as EU
+EU_COUNTRY_CODES = frozenset({
+	"AT", "BE", "BG", "HR", "CY", "CZ", "DK", "EE", "FI", "FR", "DE", "GR", "HU", "IE",
+	"IT", "LV", "LT", "LU", "MT", "NL", "PL", "PT", "RO", "SK", "SI", "ES", "SE",
+	"AX", "GF", "GP", "MF", "MQ", "RE", "YT",
+})
+
+# ZoneInfo parses tzdata on first use; keep one instance per zone
+_zoneinfo_cached = lru_cache(maxsize=TIMEZONE_CACHE_SIZE)(ZoneInfo)
+
+# Raw maxminddb readers return plain dicts from the mmap'd tree instead of
+# building geoip2 model objects per lookup. Each thread gets its own reader
+# so request threads never share decoder state; the kernel keeps a single
+# physical copy of the mapped file.
+_tls = threading.local()
+
+
+def _reader(name: str, path: Path):
+	"""Return this thread's reader for a database, opening it on first use."""
+	reader = getattr(_tls, name, None)
+	if reader is None:
+		reader = maxminddb.open_database(str(path), maxminddb.MODE_AUTO)
+		setattr(_tls, name, reader)
+	return reader
+
+
+# Open both databases at import so a missing file fails fast
+_reader("city", GEOIP_CITY_DB)
+_reader("asn", GEOIP_ASN_DB)
 
 # Load optional country metadata
 try:
 	with COUNTRY_META_FILE.open("r", encoding="utf-8") as f:
 		COUNTRY_META = json.load(f)
 except FileNotFoundError:
-	print(f"[!] Country metadata file not found: {COUNTRY_META_FILE}")
+	logger.warning("Country metadata file not found: %s", COUNTRY_META_FILE)
 	COUNTRY_META = {}
-print(f"[+] Loaded country metadata for {len(COUNTRY_META)} countries.")
+logger.info("Loaded country metadata for %d countries.", len(COUNTRY_META))
 
 
-def _lookup_connection(ip: str) -> dict | None:
+def _lookup_connection(ip: str, rdns_future=None) -> dict | None:
 	"""Resolve ASN data (ISP, ASN, route, domain) for an IP."""
 	try:
-		asn = asn_reader.asn(ip)
-	except geoip2.errors.AddressNotFoundError:
-		return None
+		record, prefix_len = _reader("asn", GEOIP_ASN_DB).get_with_prefix_len(ip)
 	except Exception as e:
-		print(f"[!] ASN lookup error for IP {ip}: {e}")
+		logger.warning("ASN lookup error for IP %s: %s", ip, e)
+		return None
+
+	if not record:
 		return None
 
-	asn_number = asn.autonomous_system_number
+	asn_number = record.get("autonomous_system_number")
+	asn_org = record.get("autonomous_system_organization")
 
 	# Use shared domain resolver module
-	domain = resolve_domain_for_ip(ip, asn_number)
+	domain = resolve_domain_for_ip(ip, asn_number, rdns_future)
 
 	connection: dict = {
 		"asn": asn_number,
-		"org": asn.autonomous_system_organization,
-		"isp": asn.autonomous_system_organization,
-		"route": str(asn.network),
+		"org": asn_org,
+		"isp": asn_org,
+		"route": str(ipaddress.ip_network(f"{ip}/{prefix_len}", strict=False)),
 	}
 
 	if domain:
@@ -61,61 +131,17 @@ def _lookup_connection(ip: str) -> dict | None:
 
 	return connection
 
-def _reverse_dns(ip: str) -> str | None:
-	"""Resolve a best-effort domain name for an IP using reverse DNS (PTR)."""
-	try:
-		hostname, aliases, _ = socket.gethostbyaddr(ip)
-	except (socket.herror, socket.gaierror):
-		# No PTR record or DNS failure
-		return None
-	except Exception as e:
-		print(f"[!] Reverse DNS error for IP {ip}: {e}")
-		return None
-
-	if not hostname:
-		return None
-
-	# Convert full hostname to a bare domain (e.g. x.y.google.com -> google.com)
-	parts = hostname.split(".")
-	if len(parts) >= 2:
-		return ".".join(parts[-2:]).lower()
-
-	return hostname.lower()
-
-def _lookup_domain(ip: str, asn_number: int | None = None) -> str | None:
-	"""Resolve domain using reverse DNS first, then PeeringDB website as fallback."""
-	# 1) Try reverse DNS
-	domain = _reverse_dns(ip)
-	if domain:
-		return domain
-
-	# 2) Try PeeringDB website if ASN is known
-	if asn_number is not None:
-		#Calculate time taken to fetch PeeringDB website
-		if DEBUG_MODE:
-			start_time = datetime.now()
-		website_url = _fetch_peeringdb_website_html(asn_number)
-		if DEBUG_MODE:
-			end_time = datetime.now()
-			elapsed_time = (end_time - start_time).total_seconds()
-			print(f"[+] PeeringDB website fetch for ASN {asn_number} took {elapsed_time:.2f} seconds.")
-		if website_url:
-			normalized = _normalize_domain(website_url)
-			if normalized:
-				return normalized
-
-	return None
-
 
+@ttl_cache(maxsize=TIMEZONE_CACHE_SIZE, ttl=TIMEZONE_CACHE_TTL)
 def _build_timezone_info(tz_name: str | None) -> dict | None:
-	"""Build a rich timezone object similar to ipwhois.io."""
+	"""Build a rich timezone object similar to ipwhois.io (cached per zone for a few seconds)."""
 	if not tz_name:
 		return None
 
 	try:
-		tz = ZoneInfo(tz_name)
+		tz = _zoneinfo_cached(tz_name)
 	except Exception as e:
-		print(f"[!] Failed to load timezone {tz_name}: {e}")
+		logger.warning("Failed to load timezone %s: %s", tz_name, e)
 		return {"id": tz_name}
 
 	now = datetime.now(tz)
@@ -144,74 +170,196 @@ def _build_timezone_info(tz_name: str | None) -> dict | None:
 	}
 
 
-def _country_code_to_emoji(cc: str | None) -> str | None:
-	"""Convert ISO2 country code to flag emoji."""
-	if not cc or len(cc) != 2:
-		return None
+def _freeze_country_meta(raw: dict) -> dict:
+	"""Build read-only country entries keyed by interned ISO2 codes.
+
+	Each entry gets a fully populated flag block and a tuple of borders so
+	the same objects can be shared by every (cached) lookup result.
+	"""
+	frozen: dict = {}
+	for cc, entry in raw.items():
+		flag_meta = entry.get("flag") or {}
+		emoji = flag_meta.get("emoji") or country_code_to_emoji(cc)
+		borders = entry.get("borders")
+
+		frozen[sys.intern(cc)] = MappingProxyType({
+			**entry,
+			"borders": tuple(borders) if borders is not None else None,
+			"flag": MappingProxyType({
+				"svg": flag_meta.get("svg"),
+				"emoji": emoji,
+				"emoji_unicode": flag_meta.get("emoji_unicode") or country_code_to_unicode_codes(cc),
+			}),
+		})
+	return frozen
+
+
+COUNTRY_META = _freeze_country_meta(COUNTRY_META)
+
+
+class _TransientLookupError(Exception):
+	"""Raised from the cached lookup so that reader failures are not memoized."""
 
+
+# Shared stand-in for missing record sections (no new dict per missing level)
+_EMPTY = MappingProxyType({})
+
+
+def _extract_city_fields(city: dict) -> tuple:
+	"""Pull the scalar fields used by a lookup out of a raw City record.
+
+	Returns (continent, continent_code, country, country_code, region,
+	region_code, city, latitude, longitude, postal, time_zone).
+	"""
+	empty = _EMPTY
+	continent = city.get("continent") or empty
+	country = city.get("country") or empty
+	subdivisions = city.get("subdivisions")
+	region = subdivisions[-1] if subdivisions else empty
+	location = city.get("location") or empty
+
+	return (
+		(continent.get("names") or empty).get("en"),
+		continent.get("code"),
+		(country.get("names") or empty).get("en"),
+		country.get("iso_code"),
+		(region.get("names") or empty).get("en"),
+		region.get("iso_code"),
+		((city.get("city") or empty).get("names") or empty).get("en"),
+		location.get("latitude"),
+		location.get("longitude"),
+		(city.get("postal") or empty).get("code"),
+		location.get("time_zone"),
+	)
+
+
+def _parse_ip(ip: str) -> ipaddress.IPv4Address | ipaddress.IPv6Address | None:
+	"""Return the address object for a valid IP literal, else None.
+
+	libc inet_pton validates the literal; the address is built from its
+	packed bytes so ipaddress does not parse the string a second time.
+	"""
+	try:
+		return ipaddress.IPv4Address(socket.inet_pton(socket.AF_INET, ip))
+	except (OSError, ValueError):
+		pass
 	try:
-		base = 0x1F1E6
-		first = base + (ord(cc[0].upper()) - ord("A"))
-		second = base + (ord(cc[1].upper()) - ord("A"))
-		return chr(first) + chr(second)
-	except Exception:
+		return ipaddress.IPv6Address(socket.inet_pton(socket.AF_INET6, ip))
+	except (OSError, ValueError):
 		return None
 
 
-def _emoji_to_unicode_codes(emoji: str | None) -> str | None:
-	"""Convert emoji string to unicode code representation (e.g. U+1F1E7 U+1F1EA)."""
-	if not emoji:
+def _lookup_ip_uncached(ip: str):
+	"""Resolve an IP past the in-process cache.
+
+	Checks the shared Redis tier first (when enabled) and stores database
+	results there, except transient lookup errors and results still
+	missing their domain. The returned result carries the timezone id
+	only; the live timezone object is built per call by lookup_ip so
+	current_time stays fresh.
+	"""
+	ip_obj = _parse_ip(ip)
+	if ip_obj is None:
+		logger.debug("Invalid IP address format: %s", ip)
+		return None, "invalid_ip"
+
+	# Internal/non-routable ranges are never in GeoLite2; skip the mmdb walks
+	# and the domain resolution entirely (the outcome is cached like any other)
+	if ip_obj.is_private or ip_obj.is_loopback or ip_obj.is_reserved or ip_obj.is_link_local:
+		return None, "not_found"
+
+	# Local cache miss: try the shared tier before walking the databases
+	shared = _shared_cache_get(ip)
+	if shared is not None:
+		return shared
+
+	result, err = _lookup_ip_db(ip, ip_obj.version)
+	# Domain-less results are left to the short-lived local entry so a later
+	# lookup can retry the resolution
+	if not (err and err.startswith("lookup_error")) and not _missing_domain(result):
+		_shared_cache_set(ip, result, err)
+	return result, err
+
+
+def _shared_cache_get(ip: str):
+	"""Return a (result, err) pair stored in Redis by any worker, or None."""
+	if not GEOIP_REDIS_CACHE_ENABLED:
 		return None
-	return " ".join(f"U+{ord(ch):04X}" for ch in emoji)
 
+	client = get_redis_client()
+	if client is None:
+		return None
 
-def lookup_ip(ip: str):
-	"""Resolve an IP using GeoLite2 (City + ASN) + country metadata."""
 	try:
-		ip_obj = ipaddress.ip_address(ip)
-	except ValueError:
-		print(f"[!] Invalid IP address format: {ip}")
-		return None, "invalid_ip"
+		raw = client.get(GEOIP_REDIS_KEY_PREFIX + ip)
+		if raw is None:
+			return None
+		entry = orjson.loads(raw)
+	except Exception as e:
+		logger.warning("Shared lookup cache read failed for IP %s: %s", ip, e)
+		return None
+
+	return entry.get("result"), entry.get("err")
+
+
+def _shared_cache_set(ip: str, result: dict | None, err: str | None) -> None:
+	"""Store a (result, err) pair in Redis; failures only cost a future miss."""
+	if not GEOIP_REDIS_CACHE_ENABLED:
+		return
+
+	client = get_redis_client()
+	if client is None:
+		return
 
 	try:
-		city = city_reader.city(ip)
-	except geoip2.errors.AddressNotFoundError:
-		print(f"[!] City not found for IP: {ip}")
-		return None, "not_found"
+		payload = orjson.dumps({"result": result, "err": err}, default=orjson_default)
+		client.setex(GEOIP_REDIS_KEY_PREFIX + ip, GEOIP_REDIS_CACHE_TTL, payload)
+	except Exception as e:
+		logger.warning("Shared lookup cache write failed for IP %s: %s", ip, e)
+
+
+def _lookup_ip_db(ip: str, version: int):
+	"""Resolve a validated, routable IP from the GeoLite2 databases."""
+	try:
+		city = _reader("city", GEOIP_CITY_DB).get(ip)
 	except Exception as e:
-		print(f"[!] City lookup error for IP {ip}: {e}")
+		logger.warning("City lookup error for IP %s: %s", ip, e)
 		return None, f"lookup_error:{e}"
 
-	continent = city.continent.names.get("en") if city.continent else None
-	country = city.country.names.get("en") if city.country else None
-	region = city.subdivisions.most_specific
-	region_name = region.names.get("en") if region and region.names else None
-	city_name = city.city.names.get("en") if city.city else None
+	if not city:
+		logger.debug("City not found for IP: %s", ip)
+		return None, "not_found"
+
+	# Start the PTR query only for addresses the database knows, so it
+	# overlaps with the field extraction and the ASN read below
+	rdns_future = start_reverse_dns(ip)
 
-	timezone_id = city.location.time_zone
-	timezone_info = _build_timezone_info(timezone_id)
+	(
+		continent, continent_code, country, country_code, region, region_code,
+		city_name, latitude, longitude, postal, timezone_id,
+	) = _extract_city_fields(city)
 
 	result: dict = {
 		"ip": ip,
 		"success": True,
-		"type": "ipv4" if isinstance(ip_obj, ipaddress.IPv4Address) else "ipv6",
+		"type": "ipv4" if version == 4 else "ipv6",
 		"continent": continent,
-		"continent_code": city.continent.code if city.continent else None,
+		"continent_code": continent_code,
 		"country": country,
-		"country_code": city.country.iso_code if city.country else None,
-		"region": region_name,
-		"region_code": region.iso_code if region else None,
+		"country_code": country_code,
+		"region": region,
+		"region_code": region_code,
 		"city": city_name,
-		"latitude": city.location.latitude,
-		"longitude": city.location.longitude,
-		"is_eu": getattr(city.country, "is_in_european_union", None),
-		"postal": city.postal.code if city.postal else None,
+		"latitude": latitude,
+		"longitude": longitude,
+		"is_eu": country_code in EU_COUNTRY_CODES,
+		"postal": postal,
 		"calling_code": None,
 		"capital": None,
 		"borders": None,
 		"flag": None,
 		"connection": None,
-		"timezone": timezone_info,
+		"timezone": timezone_id,
 	}
 
 	# Inject country metadata (if exists)
@@ -221,25 +369,122 @@ def lookup_ip(ip: str):
 		result["calling_code"] = meta.get("calling_code")
 		result["capital"] = meta.get("capital")
 		result["borders"] = meta.get("borders")
-
-		# Flag: svg + emoji + emoji_unicode
-		flag_meta = meta.get("flag") or {}
-		svg = flag_meta.get("svg")
-		emoji = flag_meta.get("emoji") or _country_code_to_emoji(cc)
-		emoji_unicode = flag_meta.get("emoji_unicode") or _emoji_to_unicode_codes(emoji)
-
-		result["flag"] = {
-			"svg": svg,
-			"emoji": emoji,
-			"emoji_unicode": emoji_unicode,
-		}
+		# Flag block is fully populated at load time
+		result["flag"] = meta["flag"]
 
 	# Resolve ASN connection details
-	connection = _lookup_connection(ip)
+	connection = _lookup_connection(ip, rdns_future)
 	if connection:
-		print(f"[+] ASN lookup succeeded for IP: {ip}")
+		logger.debug("ASN lookup succeeded for IP: %s", ip)
 		result["connection"] = connection
 	else:
-		print(f"[!] ASN lookup failed for IP: {ip}")
+		logger.debug("ASN lookup failed for IP: %s", ip)
 
 	return result, None
+
+
+def _missing_domain(result) -> bool:
+	"""Whether a result has ASN data but no domain, i.e. resolution may succeed later."""
+	if not DOMAIN_RESOLUTION_ENABLED or result is None:
+		return False
+	connection = result.get("connection")
+	return connection is not None and "domain" not in connection
+
+
+def _lookup_ttu(_key, value, now):
+	"""Expiry time of a cached (result, err) pair."""
+	ttl = GEOIP_DOMAIN_RETRY_TTL if _missing_domain(value[0]) else GEOIP_CACHE_TTL
+	return now + ttl
+
+
+@cached(TLRUCache(maxsize=GEOIP_CACHE_SIZE, ttu=_lookup_ttu), lock=threading.Lock(), info=True)
+def _lookup_ip_cached(ip: str):
+	"""Cached lookup returning an immutable (result, err) pair.
+
+	Negative outcomes (invalid_ip, not_found) are cached alongside hits so
+	that repeated noise traffic never reaches the readers again. Results
+	without a domain get the shorter domain retry lifetime.
+	"""
+	result, err = _lookup_ip_uncached(ip)
+	if err and err.startswith("lookup_error"):
+		raise _TransientLookupError(err)
+	if result is None:
+		return None, err
+	return _freeze_result(result), None
+
+
+def _freeze_result(result: dict) -> MappingProxyType:
+	"""Make a result and every nested block read-only; it is shared by every response.
+
+	Results read back from Redis carry plain JSON copies of the country
+	blocks, so those are pointed at the frozen metadata again.
+	"""
+	meta = COUNTRY_META.get(result.get("country_code"))
+	if meta is not None:
+		result["borders"] = meta.get("borders")
+		result["flag"] = meta["flag"]
+	else:
+		if result.get("borders") is not None:
+			result["borders"] = tuple(result["borders"])
+		if result.get("flag") is not None:
+			result["flag"] = MappingProxyType(result["flag"])
+	if result.get("connection") is not None:
+		result["connection"] = MappingProxyType(result["connection"])
+	return MappingProxyType(result)
+
+
+# Runs batch lookups; bounded so batches never add threads without limit
+_batch_executor = ThreadPoolExecutor(
+	max_workers=BATCH_MAX_WORKERS,
+	thread_name_prefix="netrecon-batch",
+)
+
+
+def lookup_ip(ip: str):
+	"""Resolve an IP using GeoLite2 (City + ASN) + country metadata."""
+	try:
+		frozen, err = _lookup_ip_cached(ip)
+	except _TransientLookupError as e:
+		return None, str(e)
+
+	if frozen is None:
+		return None, err
+
+	# Top-level copy for the caller; nested blocks (connection, flag) are
+	# read-only views, so the cached entry cannot be mutated through them
+	result = dict(frozen)
+	# The timezone dict is shared through its ttl_cache, so hand out a copy
+	tz_info = _build_timezone_info(frozen["timezone"])
+	result["timezone"] = dict(tz_info) if tz_info is not None else None
+	return result, None
+
+
+def lookup_ips(ips: list[str]) -> dict:
+	"""Resolve several IPs concurrently, returning {ip: (result, err)}.
+
+	Each lookup, PeeringDB fetch included, runs on the batch pool and the
+	whole batch shares one deadline; IPs still unresolved by then get
+	lookup_error:batch_timeout and their queued lookups are dropped.
+	"""
+	futures = {ip: _batch_executor.submit(lookup_ip, ip) for ip in dict.fromkeys(ips)}
+	wait(futures.values(), timeout=BATCH_TIMEOUT)
+
+	results = {}
+	for ip, future in futures.items():
+		if future.done():
+			results[ip] = future.result()
+		else:
+			future.cancel()
+			results[ip] = (None, "lookup_error:batch_timeout")
+	return results
+
+
+def lookup_cache_info() -> dict:
+	"""Return hit/miss statistics of the lookup result cache."""
+	info = _lookup_ip_cached.cache_info()
+	return {
+		"hits": info.hits,
+		"misses": info.misses,
+		"maxsize": info.maxsize,
+		"currsize": info.currsize,
+	}
@@ -0,0 +1,18 @@
+# gunicorn.conf.py
+#
+# Production server settings: pre-forked gthread workers.
+# Usage: gunicorn -c gunicorn.conf.py app:app
+
+from config import settings
+
+bind = f"0.0.0.0:{settings.port}"
+
+# Threads cover the DNS/HTTP waits. Extra worker processes add CPU parallelism,
+# but each keeps its own in-memory metrics (see README, Production Server)
+workers = settings.gunicorn_workers
+worker_class = "gthread"
+threads = settings.gunicorn_threads
+
+# Import the app (country metadata, GeoLite2 files) before forking so the
+# workers share those pages instead of loading their own copies
+preload_app = True
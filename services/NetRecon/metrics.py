@@ -1,59 +1,259 @@
+import os
 import threading
-from collections import defaultdict
-from time import time
+from array import array
+from contextlib import contextmanager
+from itertools import zip_longest
+from time import time_ns
+from types import MappingProxyType
 from datetime import datetime, timezone
 
 
+# Status codes are always three digits, so they index fixed-size tables directly
+_STATUS_SLOTS = 1000
+
+# 1 for success (2xx/3xx), 0 for error, indexed by status code
+_IS_SUCCESS = bytes(1 if 200 <= code < 400 else 0 for code in range(_STATUS_SLOTS))
+
+
+class _RWLock:
+	"""Minimal readers-writer lock; waiting writers block new readers."""
+
+	def __init__(self) -> None:
+		self._cond = threading.Condition(threading.Lock())
+		self._readers = 0
+		self._writer = False
+		self._writers_waiting = 0
+
+	@contextmanager
+	def read(self):
+		with self._cond:
+			while self._writer or self._writers_waiting:
+				self._cond.wait()
+			self._readers += 1
+		try:
+			yield
+		finally:
+			with self._cond:
+				self._readers -= 1
+				if not self._readers:
+					self._cond.notify_all()
+
+	@contextmanager
+	def write(self):
+		with self._cond:
+			self._writers_waiting += 1
+			while self._writer or self._readers:
+				self._cond.wait()
+			self._writers_waiting -= 1
+			self._writer = True
+		try:
+			yield
+		finally:
+			with self._cond:
+				self._writer = False
+				self._cond.notify_all()
+
+
+class _Shard:
+	"""Counters owned and written by a single thread."""
+
+	# Fixed slots keep the per-request attribute updates off the instance dict
+	__slots__ = ("thread", "requests", "success", "errors", "latency_ms", "paths", "statuses")
+
+	def __init__(self) -> None:
+		self.thread = threading.current_thread()
+		self.requests = 0
+		self.success = 0
+		self.errors = 0
+		self.latency_ms = 0.0
+		# Request count per path, indexed by the path id interned in Metrics
+		self.paths = array("Q")
+		# Request count per status code, indexed by the code itself
+		self.statuses = array("Q", bytes(8 * _STATUS_SLOTS))
+
+
+def _sum_arrays(arrays) -> array:
+	"""Add counter arrays index-wise; shorter arrays count as zero-padded."""
+	return array("Q", map(sum, zip_longest(*arrays, fillvalue=0)))
+
+
+def _fold_shards(shards: list[_Shard]) -> _Shard:
+	"""Return a new shard holding the sum of the given shards."""
+	folded = _Shard()
+	folded.requests = sum(s.requests for s in shards)
+	folded.success = sum(s.success for s in shards)
+	folded.errors = sum(s.errors for s in shards)
+	folded.latency_ms = sum(s.latency_ms for s in shards)
+	folded.paths = _sum_arrays([s.paths for s in shards])
+	folded.statuses = _sum_arrays([s.statuses for s in shards])
+	return folded
+
+
 class Metrics:
-	"""Simple in-memory metrics collector for NetRecon."""
+	"""Simple in-memory metrics collector for NetRecon.
+
+	Counters live in per-thread shards: each recording thread only ever
+	writes its own shard, so the hot path takes no lock. snapshot() merges
+	the shards; shards of finished threads are folded into a retired
+	shard when a new thread registers.
+
+	Paths are interned to small integer ids, so every per-thread counter
+	is a plain array index. Callers must pass a bounded set of paths
+	(route templates such as /ip/<ip>, not concrete URLs): every new path
+	takes the write lock and widens every shard's array.
+
+	Concurrent snapshots share a read lock; the write lock is only taken
+	to register a shard, intern a new path or grow a shard's path array,
+	since those are the only updates that resize a shared container.
+
+	snapshot() publishes an immutable result keyed by generation; until
+	another request is recorded, readers get that published mapping back
+	without merging or locking.
+	"""
 
 	def __init__(self) -> None:
-		self._lock = threading.Lock()
-		self.total_requests = 0
-		self.total_errors = 0
-		self.total_success = 0
-		self.path_counters = defaultdict(int)
-		self.status_counters = defaultdict(int)
-		self.last_request_timestamp = None
-		self.last_request_datetime = None
-		self.total_latency_ms = 0.0
+		self._rwlock = _RWLock()
+		self._tls = threading.local()
+		# (retired shard, live shards), rebound as one reference so lock-free
+		# readers never see a dead shard counted twice or not at all
+		self._state: tuple[_Shard, list[_Shard]] = (_Shard(), [])
+		# (generation, snapshot) of the last published snapshot
+		self._published: tuple[int, MappingProxyType] | None = None
+		self._path_ids: dict[str, int] = {}
+		self._path_names: list[str] = []
+		# Wall-clock time of the last request in integer nanoseconds
+		self._last_ns = None
+
+	def _register_shard(self) -> _Shard:
+		"""Create the calling thread's shard and retire shards of dead threads."""
+		shard = _Shard()
+		with self._rwlock.write():
+			retired, shards = self._state
+			live, dead = [], []
+			for old in shards:
+				(live if old.thread.is_alive() else dead).append(old)
+			if dead:
+				retired = _fold_shards([retired, *dead])
+			live.append(shard)
+			self._state = (retired, live)
+		self._tls.shard = shard
+		return shard
+
+	def _path_slot(self, shard: _Shard, path: str) -> int:
+		"""Intern a path if needed and make sure the shard has a slot for it."""
+		with self._rwlock.write():
+			pid = self._path_ids.get(path)
+			if pid is None:
+				pid = len(self._path_names)
+				self._path_ids[path] = pid
+				self._path_names.append(path)
+			missing = len(self._path_names) - len(shard.paths)
+			if missing > 0:
+				shard.paths.frombytes(bytes(8 * missing))
+		return pid
 
 	def record_request(self, path: str, status_code: int, duration_ms: float) -> None:
 		"""Record a single HTTP request."""
-		now_ts = time()
-		now_dt = datetime.fromtimestamp(now_ts, timezone.utc)
-		with self._lock:
-			self.total_requests += 1
-			self.path_counters[path] += 1
-			self.status_counters[status_code] += 1
-			self.total_latency_ms += duration_ms
-			self.last_request_timestamp = now_ts
-			self.last_request_datetime = now_dt
-
-			if 200 <= status_code < 400:
-				self.total_success += 1
-			else:
-				self.total_errors += 1
-
-	def snapshot(self) -> dict:
-		"""Return a snapshot of current metrics as a plain dict."""
-		with self._lock:
-			avg_latency = (
-				self.total_latency_ms / self.total_requests
-				if self.total_requests > 0
-				else 0.0
-			)
-
-			return {
-				"total_requests": self.total_requests,
-				"total_success": self.total_success,
-				"total_errors": self.total_errors,
-				"average_latency_ms": avg_latency,
-				"by_path": dict(self.path_counters),
-				"by_status_code": dict(self.status_counters),
-				"last_request_timestamp": self.last_request_timestamp,
-				"last_request_datetime": self.last_request_datetime,
-			}
-
-
-metrics = Metrics()
+		now_ns = time_ns()
+
+		shard = getattr(self._tls, "shard", None) or self._register_shard()
+		shard.latency_ms += duration_ms
+		success = _IS_SUCCESS[status_code]
+		shard.success += success
+		shard.errors += 1 - success
+		pid = self._path_ids.get(path)
+		if pid is None or pid >= len(shard.paths):
+			pid = self._path_slot(shard, path)
+		shard.paths[pid] += 1
+		shard.statuses[status_code] += 1
+		self._last_ns = now_ns
+		# Bumped last: a changed generation means the whole record is visible
+		shard.requests += 1
+
+	@property
+	def generation(self) -> int:
+		"""Change counter for the recorded data (the total request count)."""
+		retired, shards = self._state
+		return retired.requests + sum(s.requests for s in shards)
+
+	def snapshot(self) -> MappingProxyType:
+		"""Return a read-only snapshot of current metrics.
+
+		The result is shared between callers, so it and its by_path and
+		by_status_code views are immutable.
+		"""
+		generation = self.generation
+		published = self._published
+		if published is not None and published[0] == generation:
+			return published[1]
+
+		snap = self._rebuild_snapshot()
+		# The rebuilt data is at least as new as generation, so this is never stale
+		self._published = (generation, snap)
+		return snap
+
+	def _rebuild_snapshot(self) -> MappingProxyType:
+		"""Merge all shards into a fresh immutable snapshot."""
+		with self._rwlock.read():
+			retired, live = self._state
+			shards = [retired, *live]
+			total_requests = sum(s.requests for s in shards)
+			total_success = sum(s.success for s in shards)
+			total_errors = sum(s.errors for s in shards)
+			total_latency_ms = sum(s.latency_ms for s in shards)
+			path_names = self._path_names[:]
+			path_totals = _sum_arrays([s.paths for s in shards])
+			status_totals = _sum_arrays([s.statuses for s in shards])
+
+		by_path = {path_names[pid]: count for pid, count in enumerate(path_totals) if count}
+		by_status = {code: count for code, count in enumerate(status_totals) if count}
+
+		avg_latency = (
+			total_latency_ms / total_requests
+			if total_requests > 0
+			else 0.0
+		)
+		last_ns = self._last_ns
+		last_ts = last_ns / 1e9 if last_ns is not None else None
+		# Rendered here rather than per request; scrapes are rare
+		last_dt = datetime.fromtimestamp(last_ts, timezone.utc) if last_ts is not None else None
+
+		return MappingProxyType({
+			"total_requests": total_requests,
+			"total_success": total_success,
+			"total_errors": total_errors,
+			"average_latency_ms": avg_latency,
+			"by_path": MappingProxyType(by_path),
+			"by_status_code": MappingProxyType(by_status),
+			"last_request_timestamp": last_ts,
+			"last_request_datetime": last_dt,
+		})
+
+
+_metrics: Metrics | None = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> Metrics:
+	"""Return the process-wide Metrics instance, creating it on first use."""
+	global _metrics
+	instance = _metrics
+	if instance is None:
+		with _metrics_lock:
+			if _metrics is None:
+				_metrics = Metrics()
+			instance = _metrics
+	return instance
+
+
+def _reset_after_fork() -> None:
+	"""Give a forked worker its own counters and a lock nobody can be holding."""
+	global _metrics, _metrics_lock
+	_metrics = None
+	_metrics_lock = threading.Lock()
+
+
+# gunicorn preloads the app and forks workers. The reset keeps a worker from
+# inheriting pre-fork counts or a held lock; counters are not merged across
+# workers, which is why NETRECON_GUNICORN_WORKERS defaults to 1.
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,67 +1,135 @@
-from typing import Dict, Any
+from functools import lru_cache
+from itertools import islice
+from typing import Dict, Any, Iterable, Iterator
 
 
+# Output is rendered straight to UTF-8 bytes so the HTTP layer never re-encodes it.
+# Static HELP/TYPE lines plus the global counters, filled in with bytes %-formatting
+_GLOBALS_TEMPLATE = b"\n".join([
+	b"# HELP netrecon_requests_total Total number of HTTP requests handled.",
+	b"# TYPE netrecon_requests_total counter",
+	b"netrecon_requests_total %(total_requests)d",
+	b"# HELP netrecon_requests_success_total Total number of successful HTTP requests.",
+	b"# TYPE netrecon_requests_success_total counter",
+	b"netrecon_requests_success_total %(total_success)d",
+	b"# HELP netrecon_requests_error_total Total number of error HTTP responses.",
+	b"# TYPE netrecon_requests_error_total counter",
+	b"netrecon_requests_error_total %(total_errors)d",
+	b"# HELP netrecon_request_latency_ms_average Average request latency in milliseconds.",
+	b"# TYPE netrecon_request_latency_ms_average gauge",
+	b"netrecon_request_latency_ms_average %(avg_latency)r",
+	b"# HELP netrecon_last_request_timestamp_seconds Unix timestamp of the last handled request.",
+	b"# TYPE netrecon_last_request_timestamp_seconds gauge",
+	b"netrecon_last_request_timestamp_seconds %(last_ts)d",
+]) + b"\n"
+
+# HELP/TYPE headers of the labelled families, joined once at import
+_PATH_HEADER = b"\n".join([
+	b"# HELP netrecon_requests_by_path_total Total requests grouped by HTTP path.",
+	b"# TYPE netrecon_requests_by_path_total counter",
+]) + b"\n"
+
+_STATUS_HEADER = b"\n".join([
+	b"# HELP netrecon_requests_by_status_total Total requests grouped by HTTP status code.",
+	b"# TYPE netrecon_requests_by_status_total counter",
+]) + b"\n"
+
+
+# Labelled lines emitted per streamed chunk
+_CHUNK_LINES = 64
+
+# Per-line templates: label prefixes are formatted once, lines as prefix + count
+_PATH_PREFIX_FMT = 'netrecon_requests_by_path_total{path="%s"} '
+_STATUS_PREFIX_FMT = 'netrecon_requests_by_status_total{status="%s"} '
+_LINE_FMT = b"%s%d\n"
+
+# Formatted "metric{label="..."} " prefixes, reused across scrapes
+_PREFIX_CACHE_MAX = 4096
+_path_prefix_cache: dict[str, bytes] = {}
+
+# Status codes are plain ints needing no escaping, so their prefixes are built once
+_STATUS_PREFIX = {
+	code: (_STATUS_PREFIX_FMT % code).encode()
+	for code in range(100, 1000)
+}
+
+_LABEL_ESCAPES = str.maketrans({"\\": "\\\\", "\n": "\\n", '"': '\\"'})
+
+
+@lru_cache(maxsize=4096)
 def _sanitize_label_value(value: str) -> str:
 	"""Escape characters inside Prometheus label values."""
-	return (
-		value.replace("\\", "\\\\")
-		.replace("\n", "\\n")
-		.replace('"', '\\"')
-	)
+	# Most labels need no escaping; return them without allocating
+	if "\\" not in value and "\n" not in value and '"' not in value:
+		return value
+	return value.translate(_LABEL_ESCAPES)
 
 
-def format_prometheus_metrics(snapshot: Dict[str, Any]) -> str:
-	"""Convert internal metrics snapshot into Prometheus exposition format."""
-	lines: list[str] = []
+def _path_prefix(path) -> bytes:
+	"""Return the cached line prefix for a path label."""
+	prefix = _path_prefix_cache.get(path)
+	if prefix is None:
+		if len(_path_prefix_cache) >= _PREFIX_CACHE_MAX:
+			_path_prefix_cache.clear()
+		prefix = (_PATH_PREFIX_FMT % _sanitize_label_value(str(path))).encode()
+		_path_prefix_cache[path] = prefix
+	return prefix
 
-	total_requests = snapshot.get("total_requests", 0) or 0
-	total_success = snapshot.get("total_success", 0) or 0
-	total_errors = snapshot.get("total_errors", 0) or 0
-	avg_latency = snapshot.get("average_latency_ms", 0.0) or 0.0
-	by_path = snapshot.get("by_path", {}) or {}
-	by_status = snapshot.get("by_status_code", {}) or {}
-	last_ts = snapshot.get("last_request_timestamp", 0) or 0
 
-	# Total requests
-	lines.append("# HELP netrecon_requests_total Total number of HTTP requests handled.")
-	lines.append("# TYPE netrecon_requests_total counter")
-	lines.append(f"netrecon_requests_total {total_requests}")
+def _status_prefix(status) -> bytes:
+	"""Return the line prefix for a status label outside _STATUS_PREFIX."""
+	return (_STATUS_PREFIX_FMT % _sanitize_label_value(str(status))).encode()
+
 
-	# Successful requests
-	lines.append("# HELP netrecon_requests_success_total Total number of successful HTTP requests.")
-	lines.append("# TYPE netrecon_requests_success_total counter")
-	lines.append(f"netrecon_requests_success_total {total_success}")
+def _batched_lines(lines: Iterable[bytes]) -> Iterator[bytes]:
+	"""Group newline-terminated lines into chunks of up to _CHUNK_LINES lines."""
+	lines = iter(lines)
+	while chunk := b"".join(islice(lines, _CHUNK_LINES)):
+		yield chunk
 
-	# Error requests
-	lines.append("# HELP netrecon_requests_error_total Total number of error HTTP responses.")
-	lines.append("# TYPE netrecon_requests_error_total counter")
-	lines.append(f"netrecon_requests_error_total {total_errors}")
 
-	# Average latency
-	lines.append("# HELP netrecon_request_latency_ms_average Average request latency in milliseconds.")
-	lines.append("# TYPE netrecon_request_latency_ms_average gauge")
-	lines.append(f"netrecon_request_latency_ms_average {avg_latency}")
+def iter_prometheus_metrics(snapshot: Dict[str, Any]) -> Iterator[bytes]:
+	"""Yield the Prometheus exposition of a snapshot in chunks.
 
-	# Last request timestamp
-	lines.append("# HELP netrecon_last_request_timestamp_seconds Unix timestamp of the last handled request.")
-	lines.append("# TYPE netrecon_last_request_timestamp_seconds gauge")
-	lines.append(f"netrecon_last_request_timestamp_seconds {int(last_ts)}")
+	Lets the HTTP layer stream the output instead of holding it as one
+	string, which matters when path cardinality is high.
+	"""
+	by_path = snapshot.get("by_path", {}) or {}
+	by_status = snapshot.get("by_status_code", {}) or {}
+
+	yield _GLOBALS_TEMPLATE % {
+		b"total_requests": snapshot.get("total_requests", 0) or 0,
+		b"total_success": snapshot.get("total_success", 0) or 0,
+		b"total_errors": snapshot.get("total_errors", 0) or 0,
+		b"avg_latency": float(snapshot.get("average_latency_ms", 0.0) or 0.0),
+		b"last_ts": int(snapshot.get("last_request_timestamp", 0) or 0),
+	}
 
 	# Requests by path (with labels)
-	lines.append("# HELP netrecon_requests_by_path_total Total requests grouped by HTTP path.")
-	lines.append("# TYPE netrecon_requests_by_path_total counter")
-	for path, count in by_path.items():
-		if path is None:
-			continue
-		label = _sanitize_label_value(str(path))
-		lines.append(f'netrecon_requests_by_path_total{{path="{label}"}} {count}')
+	yield _PATH_HEADER
+	yield from _batched_lines(
+		_LINE_FMT % (_path_prefix(path), count)
+		for path, count in by_path.items()
+		if path is not None
+	)
 
 	# Requests by status code (with labels)
-	lines.append("# HELP netrecon_requests_by_status_total Total requests grouped by HTTP status code.")
-	lines.append("# TYPE netrecon_requests_by_status_total counter")
-	for status, count in by_status.items():
-		label = _sanitize_label_value(str(status))
-		lines.append(f'netrecon_requests_by_status_total{{status="{label}"}} {count}')
-
-	# Newline at the end is recommended by Prometheus
-	return "\n".join(lines) + "\n"
+	yield _STATUS_HEADER
+	yield from _batched_lines(
+		_LINE_FMT % (_STATUS_PREFIX.get(status) or _status_prefix(status), count)
+		for status, count in by_status.items()
+	)
+
+
+def format_prometheus_metrics_bytes(snapshot: Dict[str, Any]) -> bytes:
+	"""Convert internal metrics snapshot into UTF-8 encoded Prometheus exposition format."""
+	# Every chunk ends with a newline, as Prometheus recommends for the last line
+	buf = bytearray()
+	for chunk in iter_prometheus_metrics(snapshot):
+		buf += chunk
+	return bytes(buf)
+
+
+def format_prometheus_metrics(snapshot: Dict[str, Any]) -> str:
+	"""Convert internal metrics snapshot into Prometheus exposition format."""
+	return format_prometheus_metrics_bytes(snapshot).decode("utf-8")
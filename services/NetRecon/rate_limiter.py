@@ -3,9 +3,8 @@ from __future__ import annotations
 import logging
 from typing import Tuple, Optional
 
-import redis
-
 from config import settings
+from redis_client import get_redis_client
 
 logger = logging.getLogger(__name__)
 
@@ -21,35 +20,15 @@ class RateLimitResult:
 		self.remaining = remaining
 
 
-_redis_client: Optional[redis.Redis] = None
-
-
-def get_redis_client() -> Optional[redis.Redis]:
-	"""Initialize and cache Redis client. Fail open if connection fails."""
-	global _redis_client
-	if _redis_client is not None:
-		return _redis_client
-
-	try:
-		_redis_client = redis.Redis.from_url(settings.redis_url)
-		# Optional lightweight ping to verify connectivity
-		_redis_client.ping()
-		logger.info("Connected to Redis for rate limiting at %s", settings.redis_url)
-		return _redis_client
-	except Exception as e:
-		logger.error("Failed to connect to Redis for rate limiting: %s", e)
-		_redis_client = None
-		return None
-
-
 def check_rate_limit(
 	identifier: str,
+	cost: int = 1,
 ) -> RateLimitResult:
 	"""Check rate limit for a given identifier (e.g. client IP).
 
 	Uses a fixed window algorithm:
 		- Redis key: netrecon:rl:<identifier>
-		- INCR on each request
+		- INCRBY cost on each request (batch lookups charge one per IP)
 		- EXPIRE set to window size on first hit
 		- If count > limit => request is rejected until key expires
 	"""
@@ -69,9 +48,9 @@ def check_rate_limit(
 
 	try:
 		# Increment the counter for this identifier
-		current = client.incr(key)
+		current = client.incrby(key, cost)
 
-		if current == 1:
+		if current == cost:
 			# First hit in this window, set the TTL
 			client.expire(key, window)
 
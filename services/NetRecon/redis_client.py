@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import logging
+from typing import Optional
+
+import redis
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+_redis_client: Optional[redis.Redis] = None
+
+
+def get_redis_client() -> Optional[redis.Redis]:
+	"""Initialize and cache Redis client. Fail open if connection fails."""
+	global _redis_client
+	if _redis_client is not None:
+		return _redis_client
+
+	try:
+		_redis_client = redis.Redis.from_url(settings.redis_url)
+		# Optional lightweight ping to verify connectivity
+		_redis_client.ping()
+		logger.info("Connected to Redis at %s", settings.redis_url)
+		return _redis_client
+	except Exception as e:
+		logger.error("Failed to connect to Redis: %s", e)
+		_redis_client = None
+		return None
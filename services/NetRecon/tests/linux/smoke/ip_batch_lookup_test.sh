@@ -0,0 +1,7 @@
+#!/bin/bash
+set -e
+
+echo "Running batch IP lookup test..."
+curl -i -X POST "http://localhost:5000/ip" \
+	-H "Content-Type: application/json" \
+	-d '{"ips": ["8.8.8.8", "1.1.1.1"]}'
@@ -0,0 +1,6 @@
+Write-Host "[Windows] Running batch IP lookup test..."
+# Body goes through a file so PowerShell does not mangle the JSON quotes
+$BodyFile = New-TemporaryFile
+Set-Content -Path $BodyFile -Value '{"ips": ["8.8.8.8", "1.1.1.1"]}' -NoNewline
+curl.exe -i -X POST "http://localhost:5000/ip" -H "Content-Type: application/json" --data-binary "@$BodyFile"
+Remove-Item $BodyFile
@@ -0,0 +1,35 @@
+from string import ascii_uppercase
+from types import MappingProxyType
+
+
+# Flag emoji and their code point notation for every possible ISO2 code
+_EMOJI_BY_CC = {
+	a + b: chr(0x1F1E6 + ord(a) - 65) + chr(0x1F1E6 + ord(b) - 65)
+	for a in ascii_uppercase
+	for b in ascii_uppercase
+}
+_UNICODE_BY_CC = {
+	cc: f"U+{ord(emoji[0]):04X} U+{ord(emoji[1]):04X}"
+	for cc, emoji in _EMOJI_BY_CC.items()
+}
+
+
+def country_code_to_emoji(cc: str | None) -> str | None:
+	"""Convert ISO2 country code to flag emoji."""
+	if not cc:
+		return None
+	return _EMOJI_BY_CC.get(cc.upper())
+
+
+def country_code_to_unicode_codes(cc: str | None) -> str | None:
+	"""Convert ISO2 country code to its flag's unicode code representation (e.g. U+1F1E7 U+1F1EA)."""
+	if not cc:
+		return None
+	return _UNICODE_BY_CC.get(cc.upper())
+
+
+def orjson_default(obj):
+	"""orjson fallback serializing the read-only mappings shared by lookup results."""
+	if isinstance(obj, MappingProxyType):
+		return dict(obj)
+	raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")